@@ -2,13 +2,67 @@
 Configuration management for HTML to Markdown conversion.
 """
 
+import hashlib
 import os
 import re
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from pathlib import Path
-from typing import Dict, Set, Optional, List, Tuple
+from typing import Dict, Set, Optional, List, Tuple, Union
 import yaml
-from bs4 import BeautifulSoup, Tag
 from collections import Counter
+from lxml import etree
+from lxml.html import HtmlElement
+from .core import iter_html_files, parse_html
+
+# Tag openings and class attributes (double-quoted, single-quoted or bare) in raw HTML
+_TAG_RE = re.compile(rb'<([a-zA-Z][a-zA-Z0-9]*)')
+_CLASS_RE = re.compile(rb'\sclass\s*=\s*(?:"([^"]*)"|\'([^\']*)\'|([^\s"\'>]+))', re.IGNORECASE)
+
+# Elements whose text is not visible page content
+_INVISIBLE_ELEMENTS = {'script', 'style', 'template'}
+
+# Content type counted by analyze_element_content for each tag
+_CONTENT_TAG_TYPES = {
+    'p': 'p',
+    'h1': 'heading', 'h2': 'heading', 'h3': 'heading',
+    'h4': 'heading', 'h5': 'heading', 'h6': 'heading',
+    'a': 'a',
+    'img': 'img',
+    'ul': 'list', 'ol': 'list'
+}
+
+# Score bonus for semantic container elements
+_SEMANTIC_BONUS = {'main': 3, 'article': 2, 'section': 1}
+
+# Class name fragments that suggest main content, with their score bonus. The
+# lookahead finds every indicator in a class name, even where two overlap.
+_CONTENT_CLASS_INDICATORS = {
+    'content': 2,
+    'main': 2,
+    'article': 1.5,
+    'container': 1,
+    'section': 0.5
+}
+_CONTENT_CLASS_RE = re.compile('(?=(' + '|'.join(map(re.escape, _CONTENT_CLASS_INDICATORS)) + '))')
+
+# Common boilerplate elements
+_BOILERPLATE_ELEMENTS = {
+    'header', 'footer', 'nav', 'script', 'style', 'noscript',
+    'iframe', 'form', 'button', 'input', 'select'
+}
+
+# Class name fragments of common boilerplate classes
+_BOILERPLATE_CLASS_RE = re.compile('|'.join(map(re.escape, [
+    'navbar', 'nav-item', 'btn', 'footer', 'banner',
+    'slidecontainer', 'ratio'
+])))
+
+# Prefer the libyaml-backed loader and dumper when PyYAML was built with them
+try:
+    from yaml import CSafeDumper as SafeDumper, CSafeLoader as SafeLoader
+except ImportError:
+    from yaml import SafeDumper, SafeLoader
 
 def load_config(config_path: str) -> dict:
     """
@@ -21,38 +75,67 @@ def load_config(config_path: str) -> dict:
         dict: Configuration dictionary
     """
     with open(config_path, 'r') as f:
-        return yaml.safe_load(f)
+        return yaml.load(f, Loader=SafeLoader)
+
+def _text_length(element: HtmlElement) -> int:
+    """
+    Measure the visible text of an element, ignoring surrounding whitespace.
+    
+    Each text node is stripped before counting. Everything inside script, style and
+    template elements is skipped, as are comments, while the text following those
+    elements still counts. An element inside a template has no visible text.
+    
+    Args:
+        element: lxml element to measure
+        
+    Returns:
+        int: Number of visible text characters
+    """
+    if any(ancestor.tag == 'template' for ancestor in element.iterancestors()):
+        return 0
+    
+    length = 0
+    walker = etree.iterwalk(element, events=('start', 'end', 'comment', 'pi'))
+    for event, node in walker:
+        if event == 'start':
+            if node.tag in _INVISIBLE_ELEMENTS:
+                walker.skip_subtree()
+            elif node.text:
+                length += len(node.text.strip())
+            continue
+        # End of an element, or a comment or processing instruction: count its tail
+        if node.tail and node is not element:
+            length += len(node.tail.strip())
+    return length
 
-def analyze_element_content(element: Tag) -> Dict[str, float]:
+def analyze_element_content(element: HtmlElement, text_length: Optional[int] = None) -> Dict[str, float]:
     """
     Analyze an element's content to determine if it's likely main content.
     
     Args:
-        element: BeautifulSoup Tag to analyze
+        element: lxml element to analyze
+        text_length: Visible text length of the element, if already measured
         
     Returns:
         dict: Dictionary of metrics about the element
     """
     # Get text length excluding scripts, styles, etc.
-    text = element.get_text(strip=True)
-    text_length = len(text)
+    if text_length is None:
+        text_length = _text_length(element)
     
-    # Count different types of content
-    paragraphs = len(element.find_all('p'))
-    headings = len(element.find_all(['h1', 'h2', 'h3', 'h4', 'h5', 'h6']))
-    links = len(element.find_all('a'))
-    images = len(element.find_all('img'))
-    lists = len(element.find_all(['ul', 'ol']))
+    # Count different types of content in a single pass over the subtree
+    element_types = dict.fromkeys(('p', 'heading', 'a', 'img', 'list'), 0)
+    for descendant in element.iterdescendants(*_CONTENT_TAG_TYPES):
+        element_types[_CONTENT_TAG_TYPES[descendant.tag]] += 1
     
     # Calculate content density
-    total_elements = paragraphs + headings + links + images + lists
+    total_elements = sum(element_types.values())
     if total_elements == 0:
         content_density = 0
     else:
-        content_density = text_length / total_elements if total_elements > 0 else 0
+        content_density = text_length / total_elements
     
     # Calculate content diversity (ratio of different element types)
-    element_types = {'p': paragraphs, 'heading': headings, 'a': links, 'img': images, 'list': lists}
     non_zero_types = sum(1 for count in element_types.values() if count > 0)
     content_diversity = non_zero_types / len(element_types)
     
@@ -63,7 +146,7 @@ def analyze_element_content(element: Tag) -> Dict[str, float]:
         'total_elements': total_elements
     }
 
-def extract_content_selectors(html_content: str) -> List[Tuple[str, float]]:
+def extract_content_selectors(html_content: Union[str, bytes]) -> List[Tuple[str, float]]:
     """
     Extract potential content selectors from HTML content with priority scores.
     
@@ -73,18 +156,23 @@ def extract_content_selectors(html_content: str) -> List[Tuple[str, float]]:
     Returns:
         list: List of tuples (selector, priority_score)
     """
-    soup = BeautifulSoup(html_content, 'lxml')
+    try:
+        tree = parse_html(html_content)
+    except etree.ParserError:
+        # Empty document
+        return []
     selectors = []
     
     # Analyze all major container elements
-    containers = soup.find_all(['main', 'article', 'section', 'div'])
+    containers = tree.iter('main', 'article', 'section', 'div')
     
     for element in containers:
         # Skip empty or tiny elements
-        if not element.get_text(strip=True) or len(element.get_text(strip=True)) < 50:
+        text_length = _text_length(element)
+        if text_length < 50:
             continue
             
-        metrics = analyze_element_content(element)
+        metrics = analyze_element_content(element, text_length)
         score = 0.0
         
         # Base score from content analysis
@@ -93,46 +181,32 @@ def extract_content_selectors(html_content: str) -> List[Tuple[str, float]]:
         score += min(metrics['content_density'] / 100, 2)  # Up to 2 points for density
         
         # Bonus points for semantic elements
-        if element.name == 'main':
-            score += 3
-            if element.get('role') == 'main':
-                score += 2
-        elif element.name == 'article':
+        score += _SEMANTIC_BONUS.get(element.tag, 0)
+        if element.tag == 'main' and element.get('role') == 'main':
             score += 2
-        elif element.name == 'section':
-            score += 1
             
         # Bonus points for content-related classes
-        classes = element.get('class', [])
-        if isinstance(classes, str):
-            classes = [classes]
+        classes = element.get('class', '').split()
             
         class_score = 0
-        content_class_indicators = {
-            'content': 2,
-            'main': 2,
-            'article': 1.5,
-            'container': 1,
-            'section': 0.5
-        }
-        
+        significant_classes = []
         for cls in classes:
-            cls_lower = cls.lower()
-            for indicator, points in content_class_indicators.items():
-                if indicator in cls_lower:
-                    class_score += points
+            # Each indicator found in the class scores once
+            indicators = set(_CONTENT_CLASS_RE.findall(cls.lower()))
+            if indicators:
+                significant_classes.append(cls)
+                class_score += sum(_CONTENT_CLASS_INDICATORS[indicator] for indicator in indicators)
                     
         score += min(class_score, 3)  # Cap class bonus at 3 points
         
         # Build selector
-        selector_parts = [element.name]
+        selector_parts = [element.tag]
         
         # Add role if present
         if element.get('role'):
             selector_parts.append(f'[role="{element.get("role")}"]')
             
         # Add significant classes
-        significant_classes = [cls for cls in classes if any(indicator in cls.lower() for indicator in content_class_indicators)]
         if significant_classes:
             if len(significant_classes) == 1:
                 selector_parts.append(f'.{significant_classes[0]}')
@@ -142,62 +216,82 @@ def extract_content_selectors(html_content: str) -> List[Tuple[str, float]]:
         selector = ''.join(selector_parts)
         selectors.append((selector, score))
     
-    # Sort by score and remove duplicates while preserving order
-    seen = set()
-    unique_selectors = []
-    for selector, score in sorted(selectors, key=lambda x: x[1], reverse=True):
-        if selector not in seen:
-            seen.add(selector)
-            unique_selectors.append((selector, score))
+    # Keep the best score per selector, then sort only the unique selectors
+    best_scores: Dict[str, float] = {}
+    for selector, score in selectors:
+        if score > best_scores.get(selector, -1.0):
+            # Re-insert so tied selectors stay in the order their best score was seen
+            best_scores.pop(selector, None)
+            best_scores[selector] = score
     
-    return unique_selectors
+    return sorted(best_scores.items(), key=lambda x: x[1], reverse=True)
 
-def extract_boilerplate_selectors(html_content: str) -> Dict[str, Set[str]]:
+def extract_boilerplate_selectors(html_content: Union[str, bytes]) -> Dict[str, Set[str]]:
     """
     Extract boilerplate selectors from HTML content.
     
+    Only tag names and class attributes are needed, so they are scanned straight
+    out of the raw markup with regular expressions instead of parsing a tree.
+    
     Args:
         html_content: The HTML content to analyze
         
     Returns:
         dict: Dictionary containing sets of boilerplate selectors
     """
-    soup = BeautifulSoup(html_content, 'lxml')
-    
-    # Common boilerplate elements
-    boilerplate_elements = {
-        'header', 'footer', 'nav', 'script', 'style', 'noscript',
-        'iframe', 'form', 'button', 'input', 'select'
-    }
+    if isinstance(html_content, str):
+        html_content = html_content.encode('utf-8')
     
-    # Common boilerplate classes
-    boilerplate_classes = {
-        'navbar', 'nav-item', 'btn', 'footer', 'banner',
-        'slidecontainer', 'ratio'
-    }
+    # Find all elements
+    tag_names = {tag.lower() for tag in _TAG_RE.findall(html_content)}
+    all_elements = {tag.decode('ascii') for tag in tag_names}.intersection(_BOILERPLATE_ELEMENTS)
     
-    # Find all elements with classes
-    elements_with_classes = soup.find_all(class_=True)
+    # Find all classes
     found_classes = set()
-    
-    for element in elements_with_classes:
-        classes = element.get('class', [])
-        if isinstance(classes, str):
-            classes = [classes]
-        found_classes.update(cls for cls in classes if any(indicator in cls.lower() for indicator in boilerplate_classes))
-    
-    # Find all elements
-    all_elements = {tag.name for tag in soup.find_all() if tag.name in boilerplate_elements}
+    for match in _CLASS_RE.finditer(html_content):
+        classes = next(value for value in match.groups() if value is not None)
+        found_classes.update(cls for cls in classes.decode('utf-8', 'ignore').split() if _BOILERPLATE_CLASS_RE.search(cls.lower()))
     
     return {
         'elements': all_elements,
         'classes': found_classes
     }
 
+def _analyze_file(
+    file_path: str, seen_digests: Set[bytes]
+) -> Tuple[Optional[bytes], Optional[Tuple[List[Tuple[str, float]], Dict[str, Set[str]]]]]:
+    """
+    Extract content and boilerplate selectors from a single HTML file.
+    
+    Files whose bytes match a file already analyzed in this run are skipped, since
+    identical pages yield identical selectors.
+    
+    Args:
+        file_path: Path of the HTML file to analyze
+        seen_digests: Content digests of files already analyzed, shared between threads
+        
+    Returns:
+        tuple: (content digest, (content selectors, boilerplate selectors)); the
+        results are None for skipped files and both values are None if the file fails
+    """
+    try:
+        with open(file_path, 'rb') as f:
+            content = f.read()
+        digest = hashlib.blake2b(content, digest_size=16).digest()
+        if digest in seen_digests:
+            return digest, None
+        seen_digests.add(digest)
+        return digest, (extract_content_selectors(content), extract_boilerplate_selectors(content))
+    except Exception as e:
+        print(f"Error processing {file_path}: {e}")
+        return None, None
+
 def analyze_html_files(directory: str) -> Dict[str, Set[str] | List[str]]:
     """
     Analyze all HTML files in the given directory and its subdirectories.
     
+    Files are analyzed on a thread pool; lxml releases the GIL while parsing.
+    
     Args:
         directory: Directory to analyze
         
@@ -207,22 +301,26 @@ def analyze_html_files(directory: str) -> Dict[str, Set[str] | List[str]]:
     all_content_selectors = []
     all_boilerplate = {'elements': set(), 'classes': set()}
     
-    for root, _, files in os.walk(directory):
-        for file in files:
-            if file.endswith('.html'):
-                file_path = os.path.join(root, file)
-                try:
-                    with open(file_path, 'r', encoding='utf-8') as f:
-                        content = f.read()
-                        # Extract content selectors
-                        content_selectors = extract_content_selectors(content)
-                        all_content_selectors.extend(content_selectors)
-                        # Extract boilerplate
-                        boilerplate = extract_boilerplate_selectors(content)
-                        all_boilerplate['elements'].update(boilerplate['elements'])
-                        all_boilerplate['classes'].update(boilerplate['classes'])
-                except Exception as e:
-                    print(f"Error processing {file_path}: {e}")
+    file_paths = [entry.path for entry, _ in iter_html_files(Path(directory))]
+    analyze = partial(_analyze_file, seen_digests=set())
+    digests = []
+    results = {}
+    with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+        for digest, result in executor.map(analyze, file_paths):
+            digests.append(digest)
+            if result is not None:
+                results[digest] = result
+    
+    # Merge in file order. A later duplicate may have been the copy that was analyzed,
+    # so each result is merged at the first file with its digest.
+    for digest in digests:
+        result = results.pop(digest, None)
+        if result is None:
+            continue
+        content_selectors, boilerplate = result
+        all_content_selectors.extend(content_selectors)
+        all_boilerplate['elements'].update(boilerplate['elements'])
+        all_boilerplate['classes'].update(boilerplate['classes'])
     
     # Combine selectors that appear multiple times with high scores
     selector_scores = {}
@@ -289,7 +387,7 @@ def generate_config(directory: str, output_file: Optional[str] = None) -> None:
     
     # Write configuration to file
     with open(output_file, 'w', encoding='utf-8') as f:
-        yaml.dump(config, f, default_flow_style=False, sort_keys=False)
+        yaml.dump(config, f, Dumper=SafeDumper, default_flow_style=False, sort_keys=False)
     
     print(f"Configuration file generated: {output_file}")
     print(f"Output directory will be: {config['output_dir']}")
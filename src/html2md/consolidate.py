@@ -4,12 +4,26 @@ Markdown file consolidation functionality.
 
 import os
 import re
+from html import unescape
 from datetime import datetime
 import json
 from pathlib import Path
-from typing import Dict, List
+from types import ModuleType
+from typing import Dict, List, Optional
 from .config import load_config
 
+orjson: Optional[ModuleType]
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Tables and patterns used when cleaning filenames and content
+_SEPARATORS = str.maketrans('_-', '  ')
+_ABBREVIATIONS = {'Mwm': 'MWM', 'Ca': 'CA'}
+_ABBREVIATION_RE = re.compile(r'\b(?:' + '|'.join(_ABBREVIATIONS) + r')\b')
+_MULTI_NEWLINE_RE = re.compile(r'\n{3,}')
+
 def clean_filename(filename: str) -> str:
     """
     Convert filename to a readable title.
@@ -22,14 +36,10 @@ def clean_filename(filename: str) -> str:
     """
     # Remove extension
     name = os.path.splitext(filename)[0]
-    # Replace underscores and hyphens with spaces
-    name = re.sub(r'[_-]', ' ', name)
-    # Capitalize first letter of each word
-    name = name.title()
-    # Fix common abbreviations
-    name = name.replace('Mwm', 'MWM')
-    name = name.replace('Ca', 'CA')
-    return name
+    # Replace underscores and hyphens with spaces and capitalize each word
+    name = name.translate(_SEPARATORS).title()
+    # Fix common abbreviations, matching whole words so e.g. "Cargo" is left alone
+    return _ABBREVIATION_RE.sub(lambda match: _ABBREVIATIONS[match.group(0)], name)
 
 def clean_content(content: str) -> str:
     """
@@ -41,12 +51,11 @@ def clean_content(content: str) -> str:
     Returns:
         str: Cleaned markdown content
     """
-    # Fix special characters
-    content = content.replace('&#x2019;', "'")
-    content = content.replace('&amp;', '&')
+    # Decode HTML entities left over from conversion
+    content = unescape(content)
     
     # Remove multiple consecutive newlines
-    content = re.sub(r'\n{3,}', '\n\n', content)
+    content = _MULTI_NEWLINE_RE.sub('\n\n', content)
     
     return content.strip()
 
@@ -65,8 +74,13 @@ def consolidate_markdown(config_file: str) -> None:
     # Ensure output directory exists
     consolidated_output.parent.mkdir(parents=True, exist_ok=True)
     
-    # Get all markdown files
-    markdown_files = list(output_dir.rglob('*.md'))
+    # Get all markdown files, skipping the consolidated file itself since it is
+    # truncated as soon as streaming starts
+    consolidated_path = os.path.abspath(consolidated_output)
+    markdown_files = [
+        md_file for md_file in output_dir.rglob('*.md')
+        if os.path.abspath(md_file) != consolidated_path
+    ]
     
     # Sort files by path for consistent ordering
     markdown_files.sort()
@@ -79,39 +93,38 @@ def consolidate_markdown(config_file: str) -> None:
         'files': []
     }
     
-    # Build consolidated content
-    consolidated_content = []
-    consolidated_content.append('# Consolidated Markdown Content\n\n')
-    
-    # Process each file
-    for md_file in markdown_files:
-        # Get relative path for metadata
-        rel_path = md_file.relative_to(output_dir)
-        
-        # Read content
-        with open(md_file, 'r', encoding='utf-8') as f:
-            content = f.read()
+    # Stream consolidated content straight to disk instead of holding it in memory
+    with open(consolidated_output, 'w', encoding='utf-8', buffering=1 << 20) as out:
+        out.write('# Consolidated Markdown Content\n\n')
         
-        # Clean content
-        content = clean_content(content)
-        
-        # Add to consolidated content
-        consolidated_content.append(f'## {clean_filename(rel_path.stem)}\n\n')
-        consolidated_content.append(content)
-        consolidated_content.append('\n\n---\n\n')
-        
-        # Add to metadata
-        metadata['files'].append({
-            'path': str(rel_path),
-            'title': clean_filename(rel_path.stem),
-            'size': os.path.getsize(md_file)
-        })
-    
-    # Write consolidated content
-    with open(consolidated_output, 'w', encoding='utf-8') as f:
-        f.write(''.join(consolidated_content))
+        # Process each file
+        for md_file in markdown_files:
+            # Get relative path for metadata
+            rel_path = md_file.relative_to(output_dir)
+            
+            # Read content
+            with open(md_file, 'r', encoding='utf-8') as f:
+                content = f.read()
+            
+            # Clean content
+            content = clean_content(content)
+            
+            # Add to consolidated content
+            title = clean_filename(rel_path.stem)
+            out.write(f'## {title}\n\n')
+            out.write(content)
+            out.write('\n\n---\n\n')
+            
+            # Add to metadata
+            metadata['files'].append({
+                'path': str(rel_path),
+                'title': title,
+                'size': os.path.getsize(md_file)
+            })
     
-    # Write metadata
+    # Write metadata, serialized up front so it goes out in a single write
     metadata_file = consolidated_output.parent / 'metadata.json'
-    with open(metadata_file, 'w', encoding='utf-8') as f:
-        json.dump(metadata, f, indent=2) 
\ No newline at end of file
+    if orjson is not None:
+        metadata_file.write_bytes(orjson.dumps(metadata, option=orjson.OPT_INDENT_2))
+    else:
+        metadata_file.write_text(json.dumps(metadata, indent=2), encoding='utf-8') 
\ No newline at end of file
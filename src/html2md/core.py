@@ -2,12 +2,54 @@
 Core functionality for HTML to Markdown conversion.
 """
 
+import codecs
+import os
+import threading
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, as_completed, wait
+from functools import lru_cache
+from itertools import islice
 from pathlib import Path
-from bs4 import BeautifulSoup
 from html2text import HTML2Text
-from typing import Dict, Optional
+from lxml import etree, html as lxml_html
+from lxml.cssselect import CSSSelector
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple, Union, cast
 import re
 
+# Configuration used by _convert_file inside worker processes
+_worker_config: dict = {}
+
+# Files sent to a worker per task, and tasks kept in flight per worker
+_BATCH_SIZE = 16
+_BATCHES_PER_WORKER = 4
+
+# lxml assumes Latin-1 for byte input without a declared charset, while HTML files
+# have always been read as UTF-8, so undeclared documents use a UTF-8 parser. lxml
+# serializes parses that share a parser object, so each thread gets its own parsers.
+_parsers = threading.local()
+_META_CHARSET_RE = re.compile(rb'<meta[^>]*charset', re.IGNORECASE)
+# lxml detects byte order marks itself, but ignores the encoding named in an XML
+# declaration, so that encoding is read here
+_BOMS = (codecs.BOM_UTF8, codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)
+_XML_ENCODING_RE = re.compile(rb'\s*<\?xml[^>]*?\sencoding\s*=\s*["\']([A-Za-z][\w.:-]*)["\']')
+
+# Patterns used by clean_markdown
+_HR_RE = re.compile(r'\n\* \* \*\n+')
+_PLACEHOLDER_LINE_RE = re.compile(r'\n(?:Our\s*|__)(?=\n)')
+_HEADER_RE = re.compile(r'(\n#{1,6} .+)\n+')
+_BLANK_LINES_RE = re.compile(r'\n{3,}')
+
+# html2text is fed parser events straight from the lxml tree. These tables make the
+# events match what its HTMLParser reports for the serialized tree: void elements
+# have no end tag, script and style text is not escaped, and escaped characters
+# arrive as separate entity references. Attribute values, including URLs, are
+# passed on exactly as written in the source.
+_VOID_ELEMENTS = frozenset((
+    'area', 'base', 'basefont', 'br', 'col', 'frame', 'hr', 'img', 'input',
+    'isindex', 'link', 'meta', 'param',
+))
+_RAW_TEXT_ELEMENTS = frozenset(('script', 'style'))
+_ESCAPED_CHAR_RE = re.compile(r'([&<>])')
+
 def clean_markdown(markdown: str) -> str:
     """
     Clean up markdown output by removing common issues.
@@ -19,105 +61,408 @@ def clean_markdown(markdown: str) -> str:
         str: The cleaned markdown content
     """
     # Remove redundant horizontal rules
-    markdown = re.sub(r'\n\* \* \*\n+', '\n\n', markdown)
-    
-    # Remove empty lines with placeholder text
-    markdown = re.sub(r'\nOur\s*\n', '\n', markdown)
+    markdown = _HR_RE.sub('\n\n', markdown)
     
-    # Remove standalone underscores
-    markdown = re.sub(r'\n__\n', '\n', markdown)
+    # Remove placeholder text and standalone underscores, leaving each line's newline
+    markdown = _PLACEHOLDER_LINE_RE.sub('', markdown)
     
     # Normalize header spacing
-    markdown = re.sub(r'(\n#{1,6} .+)\n+', r'\1\n\n', markdown)
+    markdown = _HEADER_RE.sub(r'\1\n\n', markdown)
     
     # Remove multiple consecutive empty lines
-    markdown = re.sub(r'\n{3,}', '\n\n', markdown)
+    markdown = _BLANK_LINES_RE.sub('\n\n', markdown)
     
     return markdown.strip()
 
-def convert_html_to_md(html_content: str, config: dict) -> str:
+@lru_cache(maxsize=None)
+def _split_selectors(content_selector: str) -> Tuple[str, ...]:
+    """
+    Split a comma-separated content selector into its alternatives.
+    
+    Cached so each distinct selector string is only split once per process.
+    
+    Args:
+        content_selector: Comma-separated CSS selectors in priority order
+        
+    Returns:
+        tuple: Stripped selectors in priority order
+    """
+    return tuple(selector.strip() for selector in content_selector.split(','))
+
+@lru_cache(maxsize=None)
+def _compile_selector(selector: str) -> CSSSelector:
+    """
+    Compile a CSS selector for use on lxml trees.
+    
+    Cached so each distinct selector is translated to XPath only once per process.
+    
+    Args:
+        selector: CSS selector (or comma-separated selector list)
+        
+    Returns:
+        CSSSelector: The compiled selector
+    """
+    return CSSSelector(selector, translator='html')
+
+def _select(selector: str, root: lxml_html.HtmlElement) -> List[lxml_html.HtmlElement]:
+    """
+    Find the elements matching a CSS selector, in document order.
+    
+    Args:
+        selector: CSS selector (or comma-separated selector list)
+        root: Element to search below
+        
+    Returns:
+        list: The matching elements
+    """
+    # Element-only selectors always evaluate to a list of elements
+    return cast(List[lxml_html.HtmlElement], _compile_selector(selector)(root))
+
+def _compile_config_selectors(config: dict) -> None:
+    """
+    Compile every selector in a configuration ahead of conversion.
+    
+    Fills the selector cache and surfaces invalid selectors immediately, instead
+    of as a conversion error for every file.
+    
+    Args:
+        config: Configuration dictionary with content and exclude selectors
+        
+    Raises:
+        cssselect.SelectorError: If a selector cannot be parsed
+    """
+    for selector in _split_selectors(config['content_selector']):
+        _compile_selector(selector)
+    exclude_selectors = config.get('exclude_selectors', [])
+    if exclude_selectors:
+        _compile_selector(', '.join(exclude_selectors))
+
+def _feed_text(h2t: HTML2Text, text: str) -> None:
+    """
+    Feed a text node to html2text, with escaped characters as entity references.
+    
+    Args:
+        h2t: The converter being fed
+        text: Text content from the tree
+    """
+    for i, chunk in enumerate(_ESCAPED_CHAR_RE.split(text)):
+        if i % 2:
+            h2t.handle_data(chunk, True)
+        elif chunk:
+            h2t.handle_data(chunk)
+
+def _tree_to_markdown(h2t: HTML2Text, root: lxml_html.HtmlElement) -> str:
+    """
+    Convert an element to markdown without serializing it for html2text to re-parse.
+    
+    Walks the tree and calls html2text's parser callbacks directly, then finishes
+    the conversion as HTML2Text.handle does. The output is the same as handling the
+    serialized element, except that URLs are kept as written instead of being
+    percent-encoded by lxml's serializer.
+    
+    Args:
+        h2t: A fresh, configured HTML2Text instance
+        root: The element to convert; its tail is not included
+        
+    Returns:
+        str: The converted markdown content
+    """
+    h2t.start = True
+    for event, node in etree.iterwalk(root, events=('start', 'end', 'comment', 'pi')):
+        if event == 'start':
+            h2t.handle_starttag(node.tag, node.items())
+            if node.text:
+                if node.tag in _RAW_TEXT_ELEMENTS:
+                    h2t.handle_data(node.text)
+                else:
+                    _feed_text(h2t, node.text)
+            continue
+        if event == 'end' and node.tag not in _VOID_ELEMENTS:
+            h2t.handle_endtag(node.tag)
+        # Comments and processing instructions only contribute their tails
+        if node.tail and node is not root:
+            _feed_text(h2t, node.tail)
+    return h2t.optwrap(h2t.finish())
+
+def _thread_parser(encoding: Optional[str]) -> lxml_html.HTMLParser:
+    """
+    Get the calling thread's HTML parser for an encoding.
+    
+    Args:
+        encoding: Encoding to decode input with, or None to let lxml detect it
+        
+    Returns:
+        HTMLParser: A parser that is only used by the calling thread
+    """
+    parsers = getattr(_parsers, 'by_encoding', None)
+    if parsers is None:
+        parsers = _parsers.by_encoding = {}
+    parser = parsers.get(encoding)
+    if parser is None:
+        parser = parsers[encoding] = lxml_html.HTMLParser(encoding=encoding)
+    return parser
+
+def parse_html(html_content: Union[str, bytes]) -> lxml_html.HtmlElement:
+    """
+    Parse an HTML document, letting lxml decode byte input itself.
+    
+    Byte input is decoded according to its byte order mark, the encoding named in
+    its XML declaration, or a <meta> charset declaration in its first 1024 bytes, in
+    that order; otherwise it is decoded as UTF-8. Text input is passed to lxml as
+    UTF-8, since lxml rejects text that starts with an XML declaration naming an
+    encoding, as XHTML pages do.
+    
+    Args:
+        html_content: The HTML content as text or raw bytes
+        
+    Returns:
+        HtmlElement: The root element of the parsed document
+    """
+    if isinstance(html_content, str):
+        html_content = html_content.encode('utf-8')
+    elif html_content.startswith(_BOMS):
+        return lxml_html.document_fromstring(html_content, parser=_thread_parser(None))
+    else:
+        match = _XML_ENCODING_RE.match(html_content)
+        if match:
+            try:
+                parser = _thread_parser(match.group(1).decode('ascii'))
+            except LookupError:
+                # Unknown encoding name; fall back to lxml's own detection
+                parser = _thread_parser(None)
+            return lxml_html.document_fromstring(html_content, parser=parser)
+        if _META_CHARSET_RE.search(html_content, 0, 1024):
+            return lxml_html.document_fromstring(html_content, parser=_thread_parser(None))
+    return lxml_html.document_fromstring(html_content, parser=_thread_parser('utf-8'))
+
+def convert_html_to_md(html_content: Union[str, bytes], config: dict) -> str:
     """
     Convert HTML content to markdown based on configuration.
     
+    The content selector may be a comma-separated list. Its selectors are tried in
+    the order given and the first one that matches wins, so a generated config can
+    list its best candidate first with broader fallbacks after it. This differs from
+    evaluating the list as a single CSS selector group, which would return whichever
+    match comes first in the document.
+    
     Args:
-        html_content: The HTML content to convert
+        html_content: The HTML content to convert, as text or raw bytes
         config: Configuration dictionary with conversion settings
         
     Returns:
         str: The converted markdown content
     """
-    # Create HTML2Text instance
+    # Create HTML2Text instance. It keeps per-document parser state (link
+    # counters, open lists and pre blocks), so a fresh one is used per document.
     h2t = HTML2Text()
     h2t.ignore_links = not config.get('preserve_links', True)
     h2t.ignore_images = not config.get('preserve_images', True)
     h2t.body_width = 0  # Disable line wrapping
     
     # Parse HTML
-    soup = BeautifulSoup(html_content, 'lxml')
+    try:
+        tree = parse_html(html_content)
+    except etree.ParserError:
+        # Empty document
+        return ""
     
     # Find main content container
-    selectors = config['content_selector'].split(',')
     main_content = None
-    for selector in selectors:
-        main_content = soup.select_one(selector.strip())
-        if main_content:
+    for selector in _split_selectors(config['content_selector']):
+        matches = _select(selector, tree)
+        if matches:
+            main_content = matches[0]
             break
             
-    if not main_content:
+    if main_content is None:
         return ""
     
-    # Remove excluded elements
-    for selector in config.get('exclude_selectors', []):
-        for element in main_content.select(selector):
-            element.decompose()
+    # Remove excluded elements, matching all selectors in a single tree walk
+    exclude_selectors = config.get('exclude_selectors', [])
+    if exclude_selectors:
+        # Match against the whole document, so ancestors outside the container still
+        # count, and only remove matches inside the container
+        for element in _select(', '.join(exclude_selectors), tree):
+            if any(ancestor is main_content for ancestor in element.iterancestors()):
+                element.drop_tree()
     
     # Convert to markdown and clean up
-    markdown = h2t.handle(str(main_content))
+    markdown = _tree_to_markdown(h2t, main_content)
     return clean_markdown(markdown)
 
-def process_directory(input_dir: Path, output_dir: Path, config: dict, max_depth: Optional[int] = None) -> None:
+def iter_html_files(root: Path, max_depth: Optional[int] = None) -> Iterator[Tuple[os.DirEntry, int]]:
+    """
+    Recursively find HTML files below a directory.
+    
+    Walks the tree with os.scandir and an explicit stack, so directory entries carry
+    their cached type information and branches beyond max_depth are never listed.
+    
+    Args:
+        root: Directory to search
+        max_depth: Maximum directory depth to process (files directly in root count as 1)
+        
+    Yields:
+        tuple: (DirEntry of the HTML file, depth of its directory below root)
+    """
+    if max_depth is not None and max_depth < 1:
+        return
+    
+    stack = [(str(root), 0)]
+    while stack:
+        dir_path, depth = stack.pop()
+        # Subdirectories of the deepest allowed level are never pushed or type-checked
+        descend = max_depth is None or depth + 1 < max_depth
+        try:
+            entries = os.scandir(dir_path)
+        except OSError:
+            # Skip unreadable directories, as rglob and os.walk do
+            continue
+        with entries:
+            for entry in entries:
+                try:
+                    is_html = entry.name.endswith('.html') and entry.is_file()
+                    is_subdir = not is_html and descend and entry.is_dir(follow_symlinks=False)
+                except OSError:
+                    # Skip only the entry whose type cannot be determined
+                    continue
+                if is_html:
+                    yield entry, depth
+                elif is_subdir:
+                    stack.append((entry.path, depth + 1))
+
+def _init_worker(config: dict) -> None:
+    """
+    Store the conversion configuration in a worker process.
+    
+    Args:
+        config: Configuration dictionary shared by every task in the pool
+    """
+    global _worker_config
+    _worker_config = config
+    _compile_config_selectors(config)
+
+def _convert_file(task: Tuple[str, str]) -> Tuple[str, str, Optional[str], bool]:
+    """
+    Convert a single HTML file and write the markdown output.
+    
+    Runs inside a worker process, so it must stay at module level to be picklable.
+    
+    Args:
+        task: Tuple of (html_file, output_path)
+        
+    Returns:
+        tuple: (html_file, output_path, error message or None, whether content was written)
+    """
+    html_file, output_path = task
+    try:
+        with open(html_file, 'rb') as f:
+            html_content = f.read()
+        
+        markdown_content = convert_html_to_md(html_content, _worker_config)
+        
+        # Save if content was extracted
+        if not markdown_content:
+            return html_file, output_path, None, False
+        # Encode in one call and write the bytes directly, bypassing the text layer
+        with open(output_path, 'wb') as f:
+            f.write(markdown_content.encode('utf-8'))
+        return html_file, output_path, None, True
+    except Exception as e:
+        return html_file, output_path, str(e), False
+
+def _convert_batch(tasks: List[Tuple[str, str]]) -> List[Tuple[str, str, Optional[str], bool]]:
+    """
+    Convert a batch of HTML files inside a worker process.
+    
+    Args:
+        tasks: List of (html_file, output_path) tuples
+        
+    Returns:
+        list: One _convert_file result per task
+    """
+    return [_convert_file(task) for task in tasks]
+
+def _report_results(futures: Iterable[Future]) -> None:
+    """
+    Print the outcome of each file in a set of finished batches.
+    
+    Args:
+        futures: Completed _convert_batch futures
+    """
+    for future in futures:
+        for html_file, output_path, error, written in future.result():
+            if error is not None:
+                print(f"Error processing {html_file}: {error}")
+            elif written:
+                print(f"Converted {html_file} -> {output_path}")
+            else:
+                print(f"No content found in {html_file}")
+
+def process_directory(
+    input_dir: Path,
+    output_dir: Path,
+    config: dict,
+    max_depth: Optional[int] = None,
+    max_workers: Optional[int] = None
+) -> None:
     """
     Process all HTML files in a directory and convert them to markdown.
     
+    Files are streamed from the directory walk to a pool of worker processes in
+    batches, with a bounded number of batches in flight, so conversion starts
+    immediately and memory use does not grow with the number of files.
+    
     Args:
         input_dir: Directory containing HTML files
         output_dir: Directory for markdown output
         config: Configuration dictionary
         max_depth: Maximum directory depth to process
+        max_workers: Number of worker processes (defaults to the CPU count)
     """
+    # Fail fast on invalid selectors before any work is scheduled
+    _compile_config_selectors(config)
+    
     # Create output directory
     output_dir = Path(output_dir)
     output_dir.mkdir(parents=True, exist_ok=True)
     
-    # Process all HTML files
     input_dir = Path(input_dir)
-    for html_file in input_dir.rglob("*.html"):
-        try:
-            # Check depth if specified
-            if max_depth is not None:
-                rel_path = html_file.relative_to(input_dir)
-                if len(rel_path.parts) > max_depth:
-                    continue
-            
-            # Calculate output path
-            rel_path = html_file.relative_to(input_dir)
-            output_path = output_dir / rel_path.with_suffix('.md')
-            
-            # Create output directory if needed
-            output_path.parent.mkdir(parents=True, exist_ok=True)
-            
-            # Convert file
-            with open(html_file, 'r', encoding='utf-8') as f:
-                html_content = f.read()
-            
-            markdown_content = convert_html_to_md(html_content, config)
-            
-            # Save if content was extracted
-            if markdown_content:
-                output_path.write_text(markdown_content, encoding='utf-8')
-                print(f"Converted {html_file} -> {output_path}")
-            else:
-                print(f"No content found in {html_file}")
+    root_len = len(os.path.join(str(input_dir), ''))
+    output_root = str(output_dir)
+    created_dirs = {output_root}
+    
+    def iter_tasks() -> Iterator[Tuple[str, str]]:
+        # Yield (input, output) pairs so workers only convert and write
+        for entry, _ in iter_html_files(input_dir, max_depth):
+            html_file = entry.path
+            try:
+                # Calculate output path, swapping the .html suffix for .md
+                output_path = os.path.join(output_root, html_file[root_len:-5] + '.md')
+                
+                # Create output directory if needed, once per directory
+                output_parent = os.path.dirname(output_path)
+                if output_parent not in created_dirs:
+                    os.makedirs(output_parent, exist_ok=True)
+                    created_dirs.add(output_parent)
                 
-        except Exception as e:
-            print(f"Error processing {html_file}: {str(e)}") 
\ No newline at end of file
+                yield html_file, output_path
+            except Exception as e:
+                print(f"Error processing {html_file}: {str(e)}")
+    
+    # Convert files in parallel
+    max_workers = max_workers or os.cpu_count() or 1
+    max_pending = max_workers * _BATCHES_PER_WORKER
+    tasks = iter_tasks()
+    with ProcessPoolExecutor(
+        max_workers=max_workers,
+        initializer=_init_worker,
+        initargs=(config,)
+    ) as executor:
+        # Submit batches as the walk produces them, waiting whenever the window is full
+        pending: Set[Future] = set()
+        for batch in iter(lambda: list(islice(tasks, _BATCH_SIZE)), []):
+            if len(pending) >= max_pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                _report_results(done)
+            pending.add(executor.submit(_convert_batch, batch))
+        _report_results(as_completed(pending))
\ No newline at end of file
@@ -0,0 +1,102 @@
+"""
+Tests for configuration generation and HTML analysis.
+"""
+
+import pytest
+from html2md.config import (
+    analyze_html_files,
+    extract_boilerplate_selectors,
+    extract_content_selectors,
+)
+
+PAGE = """
+<html>
+<head><title>Post</title><style>.x { color: red }</style></head>
+<body>
+    <div class="navbar">
+        <a href="/">Home</a> <a href="/blog">Blog</a> <a href="/about">About the site</a>
+    </div>
+    <main role="main">
+        <article class="post-content">
+            <h1>A long article title</h1>
+            <p>First paragraph of the article with enough words to count as content.</p>
+            <p>Second paragraph with a <a href="/link">link</a> and more text here.</p>
+            <ul><li>One list item</li><li>Another list item</li></ul>
+            <script>var ignored = "not counted as visible text at all";</script>
+        </article>
+        <section class="comments">
+            <p>A comment that is long enough to be considered by the analyzer.</p>
+        </section>
+    </main>
+    <footer class='footer btn-row'>Footer text</footer>
+    <div class=banner>Banner</div>
+</body>
+</html>
+"""
+
+OTHER_PAGE = """
+<html><body>
+    <article class="content-wrapper">
+        <h2>Another page</h2>
+        <p>Enough paragraph text on this page to be scored as a content container.</p>
+        <img src="a.png" alt="A">
+    </article>
+    <nav><a href="/">Home</a></nav>
+</body></html>
+"""
+
+def test_extract_content_selectors():
+    """Test content selector scores on a typical page."""
+    selectors = extract_content_selectors(PAGE)
+
+    assert [selector for selector, _ in selectors] == [
+        'main[role="main"]',
+        'article.post-content',
+        'section',
+    ]
+    assert [score for _, score in selectors] == pytest.approx([8.008, 6.895, 2.293])
+    # Bytes input gives the same result
+    assert extract_content_selectors(PAGE.encode('utf-8')) == selectors
+
+def test_extract_boilerplate_selectors():
+    """Test boilerplate detection, including single-quoted and bare class values."""
+    boilerplate = extract_boilerplate_selectors(PAGE)
+
+    assert boilerplate['elements'] == {'script', 'style', 'footer'}
+    assert boilerplate['classes'] == {'navbar', 'footer', 'btn-row', 'banner'}
+
+def test_analyze_html_files_duplicates(tmp_path):
+    """Test that duplicated pages do not change the analysis result."""
+    unique_dir = tmp_path / "unique"
+    unique_dir.mkdir()
+    (unique_dir / "a.html").write_text(PAGE)
+    (unique_dir / "b.html").write_text(OTHER_PAGE)
+
+    duplicated_dir = tmp_path / "duplicated"
+    for sub in ("", "one", "two/three"):
+        (duplicated_dir / sub).mkdir(parents=True, exist_ok=True)
+        (duplicated_dir / sub / "a.html").write_text(PAGE)
+        (duplicated_dir / sub / "b.html").write_text(OTHER_PAGE)
+    (duplicated_dir / "one" / "c.html").write_text(OTHER_PAGE)
+
+    expected = analyze_html_files(str(unique_dir))
+    assert expected['content_selectors'] == [
+        'main[role="main"]',
+        'article.post-content',
+        'article.content-wrapper',
+    ]
+    assert analyze_html_files(str(duplicated_dir)) == expected
+
+def test_extract_content_selectors_skips_template_contents():
+    """Test that text inside templates, including nested elements, is not counted."""
+    visible = "<p>Visible paragraph text that is long enough to be counted as content.</p>"
+    hidden = (
+        '<template><div class="content"><p>'
+        + "Template text that is never rendered on the page itself. " * 3
+        + "</p></div></template>"
+    )
+    selectors = extract_content_selectors(f"<main>{hidden}{visible}</main>")
+
+    # Only the visible paragraph counts as text; the div inside the template has none
+    assert [selector for selector, _ in selectors] == ['main']
+    assert [score for _, score in selectors] == pytest.approx([4.008])
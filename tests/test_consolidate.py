@@ -0,0 +1,70 @@
+"""
+Tests for the markdown consolidation functionality.
+"""
+
+import json
+import pytest
+from pathlib import Path
+from html2md import consolidate
+from html2md.consolidate import clean_content, clean_filename, consolidate_markdown
+
+def test_clean_content():
+    """Test entity fixes and newline collapsing."""
+    content = "\n\nIt&#x2019;s fish &amp; chips\n\n\n\nNext &amp;#x2019; line&rsquo;s\n\n"
+    
+    expected = "It\u2019s fish & chips\n\nNext &#x2019; line\u2019s"
+    assert clean_content(content) == expected
+
+def test_clean_filename():
+    """Test converting filenames to readable titles."""
+    assert clean_filename("my_blog-post.md") == "My Blog Post"
+    assert clean_filename("mwm-ca_setup.md") == "MWM CA Setup"
+    assert clean_filename("cargo-specifics.md") == "Cargo Specifics"
+
+@pytest.mark.parametrize("use_orjson", [True, False])
+def test_consolidate_markdown_rerun(tmp_path, monkeypatch, use_orjson):
+    """Test that rerunning consolidation does not pick up its own previous output."""
+    if not use_orjson:
+        # Cover the stdlib json fallback as well
+        monkeypatch.setattr(consolidate, 'orjson', None)
+    elif consolidate.orjson is None:
+        pytest.skip("orjson is not installed")
+    
+    output_dir = tmp_path / "output"
+    (output_dir / "guides").mkdir(parents=True)
+    (output_dir / "intro.md").write_text("Welcome &amp; hello\n")
+    (output_dir / "guides" / "setup_guide.md").write_text("Install it\n")
+    
+    config_file = tmp_path / "config.yaml"
+    config_file.write_text(f"input_dir: {tmp_path / 'input'}\noutput_dir: {output_dir}\n")
+    
+    consolidate_markdown(str(config_file))
+    first = (output_dir / "consolidated.md").read_text()
+    consolidate_markdown(str(config_file))
+    second = (output_dir / "consolidated.md").read_text()
+    
+    expected = (
+        "# Consolidated Markdown Content\n\n"
+        "## Setup Guide\n\nInstall it\n\n---\n\n"
+        "## Intro\n\nWelcome & hello\n\n---\n\n"
+    )
+    assert first == expected
+    assert second == expected
+    assert "## Consolidated" not in second
+    
+    metadata = json.loads((output_dir / "metadata.json").read_text(encoding='utf-8'))
+    assert set(metadata) == {'generated_at', 'source_directory', 'total_files', 'files'}
+    assert metadata['source_directory'] == str(tmp_path / "input")
+    assert metadata['total_files'] == 2
+    assert metadata['files'] == [
+        {
+            'path': str(Path("guides") / "setup_guide.md"),
+            'title': "Setup Guide",
+            'size': (output_dir / "guides" / "setup_guide.md").stat().st_size,
+        },
+        {
+            'path': "intro.md",
+            'title': "Intro",
+            'size': (output_dir / "intro.md").stat().st_size,
+        },
+    ]
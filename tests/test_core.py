@@ -4,7 +4,10 @@ Tests for the core HTML to Markdown conversion functionality.
 
 import pytest
 from pathlib import Path
-from html2md.core import convert_html_to_md, process_directory
+from cssselect import SelectorError
+from html2text import HTML2Text
+from lxml import html as lxml_html
+from html2md.core import _tree_to_markdown, clean_markdown, convert_html_to_md, process_directory
 
 def test_convert_html_to_md():
     """Test basic HTML to Markdown conversion."""
@@ -27,6 +30,24 @@ def test_convert_html_to_md():
     result = convert_html_to_md(html_content, config)
     assert result.strip() == expected.strip()
 
+def test_convert_html_to_md_selector_priority():
+    """Test that comma-separated content selectors are tried in priority order."""
+    html_content = """
+    <div class="wrapper">
+        <div class="banner">Site banner</div>
+        <article>
+            <p>Article text</p>
+        </article>
+    </div>
+    """
+    
+    config = {
+        'content_selector': 'article, div.wrapper',
+        'exclude_selectors': []
+    }
+    
+    assert convert_html_to_md(html_content, config) == "Article text"
+
 def test_process_directory(tmp_path):
     """Test processing a directory of HTML files."""
     # Create test HTML files
@@ -72,3 +93,116 @@ def test_process_directory(tmp_path):
     test2_content = (output_dir / "test2.md").read_text()
     assert "Test 2" in test2_content
     assert "Content 2" in test2_content
+
+def test_process_directory_max_depth(tmp_path):
+    """Test that files deeper than max_depth are skipped."""
+    input_dir = tmp_path / "input"
+    nested_dir = input_dir / "nested"
+    nested_dir.mkdir(parents=True)
+    
+    html = '<div class="main-content"><p>{}</p></div>'
+    (input_dir / "top.html").write_text(html.format("Top"))
+    (nested_dir / "deep.html").write_text(html.format("Deep"))
+    
+    output_dir = tmp_path / "output"
+    config = {
+        'content_selector': 'div.main-content',
+        'exclude_selectors': []
+    }
+    
+    process_directory(input_dir, output_dir, config, max_depth=1)
+    
+    assert (output_dir / "top.md").exists()
+    assert not (output_dir / "nested" / "deep.md").exists()
+
+def test_convert_html_to_md_bytes():
+    """Test that byte input honours a declared charset and defaults to UTF-8."""
+    config = {
+        'content_selector': 'p',
+        'exclude_selectors': []
+    }
+    
+    undeclared = '<html><body><p>Café</p></body></html>'.encode('utf-8')
+    assert convert_html_to_md(undeclared, config) == "Café"
+    
+    declared = (
+        '<html><head><meta charset="iso-8859-1"></head>'
+        '<body><p>Café</p></body></html>'
+    ).encode('iso-8859-1')
+    assert convert_html_to_md(declared, config) == "Café"
+
+def test_process_directory_invalid_selector(tmp_path):
+    """Test that an invalid selector fails before any file is processed."""
+    input_dir = tmp_path / "input"
+    input_dir.mkdir()
+    (input_dir / "test.html").write_text('<div class="main-content"><p>Text</p></div>')
+    
+    output_dir = tmp_path / "output"
+    config = {
+        'content_selector': 'div[class=',
+        'exclude_selectors': []
+    }
+    
+    with pytest.raises(SelectorError):
+        process_directory(input_dir, output_dir, config)
+    assert not output_dir.exists()
+
+def test_tree_to_markdown_matches_html2text():
+    """Test that converting from the tree matches html2text on serialized HTML."""
+    root = lxml_html.fragment_fromstring("""
+    <div>
+        <h2>Title &amp; <em>more</em></h2>
+        <p>1 &lt; 2 &gt; 0,&nbsp;*not* emphasis<br>next <!-- note -->line &amp;+ more</p>
+        <p><a href="docs/page.html?a=1&amp;b=2">link</a> <img src="a.png" alt="A"></p>
+        <ul><li>one</li><li><code>x &lt; y</code></li></ul>
+        <pre>
+  indented &amp; kept
+</pre>
+        <script>if (a < b && c) {}</script>
+    </div>
+    """)
+    
+    expected = HTML2Text().handle(lxml_html.tostring(root, encoding='unicode'))
+    assert _tree_to_markdown(HTML2Text(), root) == expected
+
+def test_clean_markdown():
+    """Test removal of placeholder lines and normalization of spacing."""
+    markdown = "Intro\n__\n__\nOur \nOur\n# Title\nBody\n* * *\n\n\n\nEnd"
+    assert clean_markdown(markdown) == "Intro\n# Title\n\nBody\n\nEnd"
+
+def test_convert_html_to_md_xml_declaration():
+    """Test converting XHTML text that starts with an XML declaration."""
+    config = {'content_selector': 'body', 'exclude_selectors': []}
+    xhtml = (
+        '<?xml version="1.0" encoding="utf-8"?>\n'
+        '<html xmlns="http://www.w3.org/1999/xhtml"><body><p>Hi</p></body></html>'
+    )
+    assert convert_html_to_md(xhtml, config) == "Hi"
+
+def test_convert_html_to_md_exclude_outer_ancestor():
+    """Test exclude selectors whose ancestor lies outside the content container."""
+    html_content = """
+    <header><main><p>Dropped</p><div>Kept</div></main></header>
+    <p>Outside</p>
+    """
+    config = {'content_selector': 'main', 'exclude_selectors': ['header p']}
+    assert convert_html_to_md(html_content, config) == "Kept"
+
+def test_convert_html_to_md_urls_unchanged():
+    """Test that link and image URLs are not percent-encoded."""
+    html_content = '<div><a href="/a b?y=é">L</a> <img src="x y.png" alt="A"></div>'
+    config = {'content_selector': 'div', 'exclude_selectors': []}
+    assert convert_html_to_md(html_content, config) == "[L](/a b?y=é) ![A](x y.png)"
+
+def test_convert_html_to_md_bytes_bom_and_xml_declaration():
+    """Test that byte order marks and XML encoding declarations are honoured."""
+    config = {'content_selector': 'body', 'exclude_selectors': []}
+    
+    utf16 = '<html><body><p>Café</p></body></html>'.encode('utf-16')
+    assert convert_html_to_md(utf16, config) == "Café"
+    
+    latin1 = (
+        '<?xml version="1.0" encoding="iso-8859-1"?>\n'
+        '<html><body><p>Café</p></body></html>'
+    ).encode('iso-8859-1')
+    assert convert_html_to_md(latin1, config) == "Café"